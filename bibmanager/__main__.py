@@ -4,6 +4,7 @@
 import argparse
 import itertools
 import os
+import sys
 from datetime import date
 from packaging import version
 
@@ -18,6 +19,11 @@ from . import pdf_manager as pm
 from . import utils as u
 from .__init__ import __version__
 
+# Parsed bibmanager version (constant throughout a run):
+current_version = version.parse(__version__)
+# Output of 'bibm --version':
+version_message = f'bibmanager version {__version__}'
+
 
 # Parser Main Documentation:
 main_description = f"""
@@ -158,7 +164,8 @@ def cli_search(args):
         validate_while_typing=True,
         bottom_toolbar=validator.bottom_toolbar)
 
-    matches = u.parse_search(inputs)
+    # Search the already-loaded database:
+    matches = u.parse_search(inputs, bibs)
     if len(matches) == 0:
         return
     bm.display_list(matches, args.verb)
@@ -302,8 +309,11 @@ def cli_ads_search(args):
             query = None
         elif query == "":
             return
+    # Only prefetch the next entries while the user answers a prompt:
+    interactive = args.add or args.fetch or args.open
+    prefetch = None
     try:
-        am.manager(query)
+        prefetch = am.manager(query, prefetch=interactive)
     except ValueError as e:
         print(f"\nError: {str(e)}")
 
@@ -318,6 +328,11 @@ def cli_ads_search(args):
         args.filename = None
         cli_fetch(args)
 
+    # Give the prefetch a moment to finish caching, but do not wait on
+    # a slow ADS (an unfinished prefetch leaves the cache untouched):
+    if prefetch is not None:
+        prefetch.join(timeout=2.0)
+
 
 def cli_ads_add(args):
     """Command-line interface for ads-add call."""
@@ -534,6 +549,11 @@ def main():
     - https://stackoverflow.com/questions/7869345/
     - https://stackoverflow.com/questions/32017020/
     """
+    # Version request does not need the parser nor the database:
+    if sys.argv[1:] in (['-v'], ['--version']):
+        print(version_message)
+        return
+
     # Initialization check:
     if not os.path.exists(u.HOME + 'config'):
         bm.init(bibfile=None)
@@ -547,7 +567,7 @@ def main():
         '-v', '--version',
         action='version',
         help="Show bibmanager's version.",
-        version=f'bibmanager version {__version__}',
+        version=version_message,
     )
 
     # And now the sub-commands:
@@ -1278,22 +1298,24 @@ Examples
     # Parse command-line args:
     args, unknown = parser.parse_known_args()
 
+    if not hasattr(args, 'func'):
+        parser.print_help()
+        return
+
     # Version check:
     pickle_ver = bm.get_version()
-    if version.parse(__version__) < version.parse(pickle_ver):
+    saved_version = version.parse(pickle_ver)
+    if current_version < saved_version:
         print(f"Bibmanager version ({__version__}) is older than saved "
               f"database.  Please update to a version >= {pickle_ver}.")
         return
-    elif version.parse(pickle_ver) < version.parse(__version__):
+    elif saved_version < current_version:
         print(f"Updating database file from version {pickle_ver} to "
               f"version {__version__}.")
         bm.init(bibfile=u.BM_BIBFILE())
 
-    if not hasattr(args, 'func'):
-        parser.print_help()
     # Make bibmanager calls:
-    else:
-        args.func(args)
+    args.func(args)
 
 
 if __name__ == "__main__":
@@ -10,26 +10,70 @@ __all__ = [
     'key_update',
 ]
 
+import concurrent.futures
+import itertools
 import json
 import os
 import pickle
+import re
 import sys
 import textwrap
+import threading
 import urllib
 
 import prompt_toolkit
 import pygments
 from pygments.token import Token
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
 from .. import bib_manager as bm
 from .. import config_manager as cm
 from .. import utils as u
 
 
-def manager(query=None):
+# Reuse connections (HTTP keep-alive) across all requests to ADS,
+# retry (with backoff) searches hitting a transient server error.
+# Do not retry read timeouts (read=False re-raises them right away),
+# a stalled server would otherwise be waited for three times:
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(max_retries=Retry(
+    total=2, read=False, backoff_factor=0.5,
+    status_forcelist=[502, 503, 504], raise_on_status=False)))
+# (connect, read) timeouts in seconds, so a stalled server fails fast:
+_timeout = (3.05, 20)
+# Exports of up to 2000 bibcodes (four at a time) take longer to answer:
+_export_timeout = (3.05, 120)
+# Max number of bibcodes per BibTeX export request:
+_export_size = 2000
+
+# Line wrapping of displayed titles and authors:
+_wrapper = textwrap.TextWrapper(width=78, subsequent_indent='    ')
+
+# The word 'arxiv' in a key (case insensitive):
+_arxiv = re.compile('arxiv', re.IGNORECASE)
+
+
+def manager(query=None, prefetch=False):
     """
     A manager, it doesn't really do anything, it just delegates.
+
+    Parameters
+    ----------
+    query: String
+        An ADS query.  If None, display the next set of entries from
+        the cached query.
+    prefetch: Bool
+        If True, fetch the next set of entries into the cache on a
+        background (daemon) thread, and return the thread.  An unfinished
+        prefetch can be abandoned, it only updates the cache on success.
+
+    Returns
+    -------
+    thread: threading.Thread
+        The prefetching thread (only if prefetch is True and a request
+        was made).
     """
     rows = int(cm.get('ads_display'))
     if query is None and not os.path.exists(u.BM_CACHE()):
@@ -39,26 +83,70 @@ def manager(query=None):
     if query is None:
         with open(u.BM_CACHE(), 'rb') as handle:
             results, query, start, index, nmatch = pickle.load(handle)
+        # Request only the entries to display that are not yet cached:
         last = start + len(results)
         if last < nmatch and index + rows > last:
-            new_results, nmatch = search(query, start=last)
+            new_results, nmatch = search(
+                query, start=last, cache_rows=index+rows-last)
             results = results[index-start:] + new_results
             start = index
-            last = start + len(results)
     else:
         start = 0
         index = start
-        results, nmatch = search(query, start=start)
+        results, nmatch = search(query, start=start, cache_rows=rows)
 
+    if nmatch == 0:
+        print("There are no entries matching this query.")
     display(results, start, index, rows, nmatch)
     index += rows
     if index >= nmatch:
         with u.ignored(OSError):
             os.remove(u.BM_CACHE())
     else:
-        with open(u.BM_CACHE(), 'wb') as handle:
-            pickle.dump(
-                [results, query, start, index, nmatch], handle, protocol=4)
+        # Entries already displayed are no longer needed:
+        results = results[index-start:]
+        start = index
+        cache = u.BM_CACHE()
+        _write_cache(cache, [results, query, start, index, nmatch])
+
+        # Get the next set while the user is reading the current one:
+        last = start + len(results)
+        if prefetch and last < nmatch and len(results) < rows:
+            thread = threading.Thread(
+                target=_prefetch,
+                args=(cache, results, query, start, rows-len(results)),
+                daemon=True)
+            thread.start()
+            return thread
+
+
+def _write_cache(cache, content):
+    """
+    Pickle the ADS query state into the cache file.  Write to a temporary
+    file first and then move it, so the cache is never half-written.
+    A failed write does not leave the temporary file behind.
+    """
+    try:
+        with open(f'{cache}.tmp', 'wb') as handle:
+            pickle.dump(content, handle, protocol=4)
+        os.replace(f'{cache}.tmp', cache)
+    finally:
+        with u.ignored(OSError):
+            os.remove(f'{cache}.tmp')
+
+
+def _prefetch(cache, results, query, start, nrows):
+    """
+    Append the next nrows entries of a query to the ADS cache.
+    On failure, leave the cache untouched (a later call will retry).
+    """
+    try:
+        new_results, nmatch = search(
+            query, start=start+len(results), cache_rows=nrows)
+    except (ValueError, requests.exceptions.RequestException):
+        return
+    index = start
+    _write_cache(cache, [results+new_results, query, start, index, nmatch])
 
 
 def search(query, start=0, cache_rows=200, sort='pubdate+desc'):
@@ -116,13 +204,26 @@ def search(query, start=0, cache_rows=200, sort='pubdate+desc'):
     org.apache.solr.search.SyntaxError: org.apache.solr.common.SolrException: undefined field properties
     """
     token = cm.get('ads_token')
-    query = urllib.parse.quote(query)
-
-    r = requests.get(
-        'https://api.adsabs.harvard.edu/v1/search/query?'
-        f'q={query}&start={start}&rows={cache_rows}'
-        f'&sort={sort}&fl=title,author,year,bibcode,pub',
-        headers={'Authorization': f'Bearer {token}'})
+    params = {
+        'q': query,
+        'start': start,
+        'rows': cache_rows,
+        # The '+' in sort is the URL-encoded blank (e.g., 'pubdate+desc'):
+        'sort': sort.replace('+', ' '),
+        'fl': 'title,author,year,bibcode,pub',
+    }
+    # Field separators (author:, year:) and name commas are valid
+    # as-is in a URL query:
+    try:
+        r = _session.get(
+            'https://api.adsabs.harvard.edu/v1/search/query',
+            params=urllib.parse.urlencode(params, safe=':,'),
+            headers={'Authorization': f'Bearer {token}'},
+            timeout=_timeout)
+    except requests.exceptions.Timeout:
+        raise ValueError('ADS request timed out, try again later.')
+    except requests.exceptions.ConnectionError:
+        raise ValueError('Could not connect to ADS, try again later.')
     if not r.ok:
         if r.status_code == 401:
             raise ValueError(
@@ -170,39 +271,38 @@ def display(results, start, index, rows, nmatch, short=True):
     >>> results, nmatch = am.search(query, start=start)
     >>> display(results, start, index, rows, nmatch)
     """
-    for result in results[index-start:index-start+rows]:
-        tokens = [(Token.Text, '\n')]
-        title = textwrap.fill(
-            f"Title: {result['title'][0]}",
-            width=78,
-            subsequent_indent='    ')
+    entries = results[index-start:index-start+rows]
+    if len(entries) == 0:
+        return
+
+    author_format = 'short' if short else 'long'
+    # Collect the tokens of all entries, then print them all at once:
+    tokens = []
+    for result in entries:
+        tokens += [(Token.Text, '\n')]
+        title = _wrapper.fill(f"Title: {result['title'][0]}")
         tokens += u.tokenizer('Title', title[7:])
 
         if 'author' in result:
             author_list = [u.parse_name(author) for author in result['author']]
-            author_format = 'short' if short else 'long'
-            authors = textwrap.fill(
-                f"Authors: {u.get_authors(author_list, format=author_format)}",
-                width=78,
-                subsequent_indent='    ',
-            )
+            authors = _wrapper.fill(
+                f"Authors: {u.get_authors(author_list, format=author_format)}")
         else:
             authors = 'Authors: ---'
         tokens += u.tokenizer('Authors', authors[9:])
 
-        adsurl = f"https://ui.adsabs.harvard.edu/abs/{result['bibcode']}"
-        tokens += u.tokenizer('ADS URL', adsurl)
-
         bibcode = result['bibcode']
+        adsurl = f"https://ui.adsabs.harvard.edu/abs/{bibcode}"
+        tokens += u.tokenizer('ADS URL', adsurl)
         tokens += u.tokenizer('bibcode', bibcode, Token.Name.Label)
 
-        style = prompt_toolkit.styles.style_from_pygments_cls(
-            pygments.styles.get_style_by_name(cm.get('style')))
-        prompt_toolkit.print_formatted_text(
-            prompt_toolkit.formatted_text.PygmentsTokens(tokens),
-            end="",
-            style=style,
-            output=prompt_toolkit.output.defaults.create_output(sys.stdout))
+    style = prompt_toolkit.styles.style_from_pygments_cls(
+        pygments.styles.get_style_by_name(cm.get('style')))
+    prompt_toolkit.print_formatted_text(
+        prompt_toolkit.formatted_text.PygmentsTokens(tokens),
+        end="",
+        style=style,
+        output=prompt_toolkit.output.defaults.create_output(sys.stdout))
 
     if index + rows < nmatch:
         more = "  To show the next set, execute:\nbibm ads-search -n"
@@ -272,68 +372,57 @@ def add_bibtex(
     Warning: bibcode '1925PhDT.....X...1P' not found.
     """
     token = cm.get('ads_token')
-    # Keep the originals untouched (copies will be modified):
-    bibcodes, keys = input_bibcodes.copy(), input_keys.copy()
+    # Inputs are only read (no need to copy):
+    bibcodes, keys = input_bibcodes, input_keys
 
     if tags is None:
         tags = [[] for _ in bibcodes]
 
     # Make request:
-    size = 2000
+    size = _export_size
     bibcode_chunks = [bibcodes[i:i+size] for i in range(0,len(bibcodes), size)]
 
-    nfound = 0
-    results = ''
-    for bc_chunk in bibcode_chunks:
-        r = requests.post(
-            "https://api.adsabs.harvard.edu/v1/export/bibtex",
-            headers={"Authorization": f'Bearer {token}',
-                     "Content-type": "application/json"},
-            data=json.dumps({"bibcode":bc_chunk}))
-        # No valid outputs:
-        if not r.ok:
-            if r.status_code == 500:
-                raise ValueError(
-                    'HTTP request has failed (500): '
-                    'Internal Server Error')
-            if r.status_code == 401:
-                raise ValueError(
-                    'Unauthorized access to ADS.  '
-                    'Check that the ADS token is valid.')
-            if r.status_code == 404:
-                raise ValueError(
-                    'There were no entries found for the requested bibcodes.')
-            try:
-                reason = r.json()['error']
-            except:
-                reason = r.text
-            raise ValueError(f'HTTP request failed ({r.status_code}): {reason}')
-        resp = r.json()
-        nfound += int(resp['msg'].split()[1])
-        results += resp["export"]
+    # Request the chunks concurrently (keep order of outputs):
+    headers = {
+        "Authorization": f'Bearer {token}',
+        "Content-type": "application/json"}
+    nthreads = min(4, max(len(bibcode_chunks), 1))
+    with concurrent.futures.ThreadPoolExecutor(nthreads) as executor:
+        responses = list(executor.map(
+            _export_bibtex, bibcode_chunks, itertools.repeat(headers)))
+    nfound = sum(int(resp['msg'].split()[1]) for resp in responses)
+    exports = [resp["export"] for resp in responses]
 
     # Keep counts of things:
     nreqs = len(bibcodes)
 
     # Split output into separate BibTeX entries (keep as strings):
-    results = results.strip().split("\n\n")
+    results = "".join(exports).strip().split("\n\n")
+
+    # Position of each identifier in the inputs (keep first occurrence,
+    # as list.index() would do):
+    bibcode_index = {
+        bibcode:i for i,bibcode in reversed(list(enumerate(bibcodes)))}
+    eprint_index = {eprint:i for i,eprint in reversed(list(enumerate(eprints)))}
+    doi_index = {doi:i for i,doi in reversed(list(enumerate(dois)))}
 
     new_keys = {}
     new_bibs = []
-    founds = [False for _ in bibcodes]
+    matched = set()
     arxiv_updates = 0
+    unmatched = []
     # Match results to bibcodes,keys:
     for result in reversed(results):
         ibib = None
         new = bm.Bib(result)
         # Output bibcode is one of the input bibcodes:
-        if new.bibcode in bibcodes:
-            ibib = bibcodes.index(new.bibcode)
+        if new.bibcode in bibcode_index:
+            ibib = bibcode_index[new.bibcode]
         # Else, check for bibcode updates in remaining bibcodes:
-        elif new.eprint is not None and new.eprint in eprints:
-            ibib = eprints.index(new.eprint)
-        elif new.doi is not None and new.doi in dois:
-            ibib = dois.index(new.doi)
+        elif new.eprint is not None and new.eprint in eprint_index:
+            ibib = eprint_index[new.eprint]
+        elif new.doi is not None and new.doi in doi_index:
+            ibib = doi_index[new.doi]
 
         if ibib is not None:
             new.tags = tags[ibib]
@@ -347,25 +436,28 @@ def add_bibtex(
 
             new.update_key(new_key)
             new_bibs.append(new)
-            founds[ibib] = True
-            results.remove(result)
+            matched.add(ibib)
+        else:
+            unmatched.append(result)
+    # Keep the ADS order:
+    unmatched.reverse()
 
     # Warnings:
-    if nfound < nreqs or len(results) > 0:
+    if nfound < nreqs or len(unmatched) > 0:
         warning = u.BANNER + "Warning:\n"
         # bibcodes not found
-        missing = [
-            bibcode
-            for bibcode,found in zip(bibcodes, founds)
-            if not found]
         if nfound < nreqs:
+            missing = [
+                bibcode
+                for ibib,bibcode in enumerate(bibcodes)
+                if ibib not in matched]
             warning += (
                 '\nThere were bibcodes unmatched or not found in ADS:\n - '
                 + '\n - '.join(missing) + "\n")
         # bibcodes not matched:
-        if len(results) > 0:
+        if len(unmatched) > 0:
             warning += '\nThese ADS results did not match input bibcodes:\n\n'
-            warning += '\n\n'.join(results) + "\n"
+            warning += '\n\n'.join(unmatched) + "\n"
         warning += u.BANNER
         print(warning)
 
@@ -398,6 +490,43 @@ def add_bibtex(
     return updated
 
 
+def _export_bibtex(bibcodes, headers):
+    """
+    Request the BibTeX export of a list of bibcodes from ADS.
+    Return the decoded JSON response, raise ValueError on failure.
+    """
+    try:
+        r = _session.post(
+            "https://api.adsabs.harvard.edu/v1/export/bibtex",
+            headers=headers,
+            data=json.dumps(
+                {"bibcode":bibcodes}, separators=(',',':')).encode(),
+            timeout=_export_timeout)
+    except requests.exceptions.Timeout:
+        raise ValueError('ADS request timed out, try again later.')
+    except requests.exceptions.ConnectionError:
+        raise ValueError('Could not connect to ADS, try again later.')
+    # No valid outputs:
+    if not r.ok:
+        if r.status_code == 500:
+            raise ValueError(
+                'HTTP request has failed (500): '
+                'Internal Server Error')
+        if r.status_code == 401:
+            raise ValueError(
+                'Unauthorized access to ADS.  '
+                'Check that the ADS token is valid.')
+        if r.status_code == 404:
+            raise ValueError(
+                'There were no entries found for the requested bibcodes.')
+        try:
+            reason = r.json()['error']
+        except:
+            reason = r.text
+        raise ValueError(f'HTTP request failed ({r.status_code}): {reason}')
+    return r.json()
+
+
 def update(update_keys=True, base=None, return_replacements=False):
     """
     Do an ADS query by bibcode for all entries that have an ADS bibcode.
@@ -426,21 +555,15 @@ def update(update_keys=True, base=None, return_replacements=False):
         bibs = base
 
     # Filter entries that have a bibcode and not frozen:
-    keys = [
-        bib.key for bib in bibs
-        if bib.bibcode is not None and not bib.freeze]
-    bibcodes = [
-        bib.bibcode for bib in bibs
-        if bib.bibcode is not None and not bib.freeze]
-    eprints = [
-        bib.eprint for bib in bibs
-        if bib.bibcode is not None and not bib.freeze]
-    dois = [
-        bib.doi for bib in bibs
-        if bib.bibcode is not None and not bib.freeze]
-    tags = [
-        bib.tags for bib in bibs
-        if bib.bibcode is not None and not bib.freeze]
+    keys, bibcodes, eprints, dois, tags = [], [], [], [], []
+    for bib in bibs:
+        if bib.bibcode is None or bib.freeze:
+            continue
+        keys.append(bib.key)
+        bibcodes.append(bib.bibcode)
+        eprints.append(bib.eprint)
+        dois.append(bib.doi)
+        tags.append(bib.tags)
     # Query-replace:
     bibs, replacements = add_bibtex(
         bibcodes, keys, eprints, dois, update_keys, base, tags,
@@ -488,11 +611,10 @@ def key_update(key, bibcode, alternate_bibcode):
     if old_year != year and old_year in key:
         key = key.replace(old_year, year, 1)
 
-    # Update journal:
-    journal = bibcode[4:9].replace('.','').replace('&','').lower()
-    # Search for the word 'arxiv' in key:
-    ijournal = key.lower().find('arxiv')
-    if ijournal >= 0:
-        key = "".join([key[:ijournal], journal, key[ijournal+5:]])
+    # Update journal if the key has the word 'arxiv':
+    match = _arxiv.search(key)
+    if match is not None:
+        journal = bibcode[4:9].replace('.','').replace('&','').lower()
+        key = "".join([key[:match.start()], journal, key[match.end():]])
 
     return key
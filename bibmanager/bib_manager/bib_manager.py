@@ -51,12 +51,18 @@ from ..__init__ import __version__
 
 # Some constant definitions:
 lexer = prompt_toolkit.lexers.PygmentsLexer(BibTeXLexer)
+# Pygments lexers are reusable, so display_bibs() shares a single one:
+bibtex_lexer = BibTeXLexer()
 
 months  = {
     "jan":1, "feb":2, "mar":3, "apr": 4, "may": 5, "jun":6,
     "jul":7, "aug":8, "sep":9, "oct":10, "nov":11, "dec":12,
 }
 
+# Character-deletion tables for str.translate():
+no_braces = str.maketrans('', '', '{}')
+no_braces_quotes = str.maketrans('', '', '{}"')
+
 
 class Bib(object):
   """
@@ -118,10 +124,10 @@ class Bib(object):
       for key, value, nested in fields:
           if key == "title":
               # Title with no braces, tabs, nor linebreak and corrected blanks:
-              self.title = " ".join(re.sub("({|})", "", value).split())
+              self.title = " ".join(value.translate(no_braces).split())
           elif key == "booktitle" and self.title is None:
               # Only when the entry does not contain a 'title' field:
-              self.title = " ".join(re.sub("({|})", "", value).split())
+              self.title = " ".join(value.translate(no_braces).split())
 
           elif key == "author":
               # Parse authors finding all non-brace-nested 'and' instances:
@@ -134,7 +140,7 @@ class Bib(object):
                   for author,nested in zip(authors,nests)]
 
           elif key == "year":
-              value = re.sub('({|}|")', '', value)
+              value = value.translate(no_braces_quotes)
               if value.isnumeric():
                   self.year = int(value)
               else:
@@ -165,8 +171,10 @@ class Bib(object):
           elif key == "adsurl":
               self.adsurl = value
               # Get bibcode from adsurl, un-code UTF-8, and remove backslashes:
-              bibcode = os.path.split(value)[1].replace('\\', '')
-              self.bibcode = urllib.parse.unquote(bibcode)
+              bibcode = value.rpartition('/')[2].replace('\\', '')
+              if '%' in bibcode:
+                  bibcode = urllib.parse.unquote(bibcode)
+              self.bibcode = bibcode
 
           elif key == "eprint":
               self.eprint = value.replace('arXiv:','').replace('astro-ph/','')
@@ -268,19 +276,17 @@ class Bib(object):
       von    = u.purify(author.von)
       last   = u.purify(author.last)
       jr     = u.purify(author.jr)
-      # Remove non-matching authors by each non-empty field:
-      if len(jr) > 0:
-          authors = [author for author in authors if jr  == u.purify(author.jr)]
-      if len(von) > 0:
-          authors = [
-              author for author in authors
-              if von == u.purify(author.von)]
-      if len(first) > 0:
-          authors = [
-              author for author in authors
-              if first == u.initials(author.first)[0:len(first)]]
-      authors = [author for author in authors if last == u.purify(author.last)]
-      return len(authors) >= 1
+      # Match against each non-empty field, stop at first matching author:
+      for author in authors:
+          if last != u.purify(author.last):
+              continue
+          if len(jr) > 0 and jr != u.purify(author.jr):
+              continue
+          if len(von) > 0 and von != u.purify(author.von):
+              continue
+          if u.initials(author.first).startswith(first):
+              return True
+      return False
 
   # https://docs.python.org/3.6/library/stdtypes.html
   def __lt__(self, other):
@@ -417,7 +423,7 @@ def display_bibs(labels, bibs, meta=False):
         tokens += [(Token.Text, label)]
         if meta:
             tokens += [(Token.Comment, bib.meta())]
-        tokens += list(pygments.lex(bib.content, lexer=BibTeXLexer()))
+        tokens += list(pygments.lex(bib.content, lexer=bibtex_lexer))
         tokens += [(Token.Text, "\n")]
 
     print_formatted_text(
@@ -452,13 +458,16 @@ def display_list(bibs, verb=-1):
         display_bibs(labels=None, bibs=bibs, meta=True)
         return
 
-    style = prompt_toolkit.styles.style_from_pygments_cls(
-        pygments.styles.get_style_by_name(cm.get('style')))
     if verb < 0:
         keys = "\n".join([bib.key for bib in bibs])
         print(f'\nKeys:\n{keys}')
         return
 
+    style = prompt_toolkit.styles.style_from_pygments_cls(
+        pygments.styles.get_style_by_name(cm.get('style')))
+    author_format = 'short' if verb < 2 else 'long'
+    # Collect the tokens of all entries, then print them all at once:
+    tokens = []
     for bib in bibs:
         year = '' if bib.year is None else f', {bib.year}'
         title = textwrap.fill(
@@ -467,7 +476,6 @@ def display_list(bibs, verb=-1):
             subsequent_indent='    ')[7:]
         title_tokens = u.tokenizer('Title', title)
 
-        author_format = 'short' if verb < 2 else 'long'
         authors = textwrap.fill(
             f"Authors: {bib.get_authors(format=author_format)}",
             width=78, subsequent_indent='    ')[9:]
@@ -493,17 +501,19 @@ def display_list(bibs, verb=-1):
 
         key_tokens = u.tokenizer('key', bib.key, Token.Name.Label)
 
-        print_formatted_text(
-            PygmentsTokens(
-                [(Token.Text, '\n')]
-                + title_tokens
-                + author_tokens
-                + url_tokens
-                + meta_tokens
-                + key_tokens),
-            end="",
-            style=style,
-            output=create_output(sys.stdout))
+        tokens += (
+            [(Token.Text, '\n')]
+            + title_tokens
+            + author_tokens
+            + url_tokens
+            + meta_tokens
+            + key_tokens)
+
+    print_formatted_text(
+        PygmentsTokens(tokens),
+        end="",
+        style=style,
+        output=create_output(sys.stdout))
 
 
 def remove_duplicates(bibs, field):
@@ -540,15 +550,20 @@ def remove_duplicates(bibs, field):
     if len(multis) == 0:
         return replacements
 
+    # Indices of the entries in each group of same-field values:
+    groups = np.split(
+        np.argsort(uinv, kind='stable'), np.cumsum(counts)[:-1])
+
     removes = []
     for m in multis:
-        all_indices = np.where(uinv == m)[0]
+        all_indices = groups[m]
         entries = [bibs[i].content for i in all_indices]
 
         # Remove identical entries:
         uentries, uidx = np.unique(entries, return_index=True)
         indices = list(all_indices[uidx])
-        removes += [idx for idx in all_indices if idx not in indices]
+        unique_indices = set(indices)
+        removes += [idx for idx in all_indices if idx not in unique_indices]
         if len(uentries) == 1:
             continue
 
@@ -629,11 +644,16 @@ def filter_field(bibs, new, field, take):
         'ask': Ask user to decide (interactively).
     """
     fields = [getattr(bib,field) for bib in bibs]
+    # Index of the first database entry for each field value:
+    field_index = {}
+    for idx,value in enumerate(fields):
+        if value is not None:
+            field_index.setdefault(value, idx)
     removes = []
     for i,bib in enumerate(new):
-        if getattr(bib,field) is None or getattr(bib,field) not in fields:
+        idx = field_index.get(getattr(bib,field))
+        if idx is None:
             continue
-        idx = fields.index(getattr(bib,field))
         # There could be entries with same ISBN but different DOI:
         if field == 'isbn':
             new_doi = '' if bib.doi is None else bib.doi
@@ -792,9 +812,12 @@ def save(entries):
     >>> # TBD: Load some entries
     >>> bm.save(entries)
     """
-    with open(u.BM_DATABASE(), 'wb') as handle:
+    bm_database = u.BM_DATABASE()
+    with open(bm_database, 'wb') as handle:
         pickle.dump(entries, handle, protocol=4)
         pickle.dump(__version__, handle, protocol=4)
+    with u.ignored(OSError):
+        _cache_version(bm_database, __version__)
 
 
 def load(bm_database=None):
@@ -888,21 +911,45 @@ def get_version(bm_database=None):
     >>> import bibmanager.bib_manager as bm
     >>> bibs = bm.get_version()
     """
+    default_database = u.BM_DATABASE()
     if bm_database is None:
-        bm_database = u.BM_DATABASE()
+        bm_database = default_database
 
     if not os.path.exists(bm_database):
         return __version__
 
+    # Skip unpickling the database if it has not changed since last call:
+    is_default = bm_database == default_database
+    if is_default and os.path.exists(u.BM_VERSION_CACHE()):
+        stat = os.stat(bm_database)
+        with open(u.BM_VERSION_CACHE(), 'r') as handle:
+            stamp, _, version = handle.read().partition('|')
+        if stamp == f'{stat.st_mtime_ns}:{stat.st_size}' and version != '':
+            return version
+
     with open(bm_database, 'rb') as handle:
         dummy = pickle.load(handle)
         try:
             version = pickle.load(handle)
         except EOFError:
             version = '0.0.0'
+    # The cache is only a shortcut, failing to write it is not an error:
+    if is_default:
+        with u.ignored(OSError):
+            _cache_version(bm_database, version)
     return version
 
 
+def _cache_version(bm_database, version):
+    """
+    Store the version of a database file, tagged with the file's
+    timestamp and size so that get_version() can detect stale values.
+    """
+    stat = os.stat(bm_database)
+    with open(u.BM_VERSION_CACHE(), 'w') as handle:
+        handle.write(f'{stat.st_mtime_ns}:{stat.st_size}|{version}')
+
+
 def export(entries, bibfile=None, meta=False):
     """
     Export list of Bib() entries into a .bib file.
@@ -936,13 +983,13 @@ def export(entries, bibfile=None, meta=False):
                 f'{path}/orig_{today}_{bfile}',
             )
 
+    # Assemble the whole file, then write it at once:
+    if meta:
+        bib_text = [f'{bib.meta()}{bib.content}\n\n' for bib in entries]
+    else:
+        bib_text = [f'{bib.content}\n\n' for bib in entries]
     with open(bibfile, 'w', encoding='utf-8') as f:
-        f.writelines(header)
-        for bib in entries:
-            if meta:
-                f.write(bib.meta())
-            f.write(bib.content)
-            f.write("\n\n")
+        f.write(''.join(header + bib_text))
 
 
 def merge(bibfile=None, new=None, take="old", base=None):
@@ -997,13 +1044,15 @@ def merge(bibfile=None, new=None, take="old", base=None):
     filter_field(bibs, new, "eprint", take)
 
     # Filter duplicate key:
-    keep = np.zeros(len(new), bool)
-    bm_keys = [bib.key for bib in bibs]
-    for i,bib in enumerate(new):
-        if bib.key not in bm_keys:
-            keep[i] = True
+    kept = []
+    bm_keys = {}
+    for idx,bib in enumerate(bibs):
+        bm_keys.setdefault(bib.key, idx)
+    for bib in new:
+        idx = bm_keys.get(bib.key)
+        if idx is None:
+            kept.append(bib)
             continue
-        idx = bm_keys.index(bib.key)
         if bib.content == bibs[idx].content:
             continue # Duplicate, do not take
         else:
@@ -1014,19 +1063,22 @@ def merge(bibfile=None, new=None, take="old", base=None):
             if s == "n":
                 bibs[idx].update_content(bib)
             elif s != "":
-                new[i].key = s
-                new[i].content.replace(bib.key, s)
-                keep[i] = True
-    new = [bib for bib,keeper in zip(new,keep) if keeper]
+                bib.key = s
+                bib.content.replace(bib.key, s)
+                kept.append(bib)
+    new = kept
 
     # Different key, same title:
-    keep = np.zeros(len(new), bool)
-    bm_titles = [bib.title for bib in bibs]
-    for i,bib in enumerate(new):
-        if bib.title not in bm_titles or bib.title is None:
-            keep[i] = True
+    kept = []
+    bm_titles = {}
+    for idx,bib in enumerate(bibs):
+        if bib.title is not None:
+            bm_titles.setdefault(bib.title, idx)
+    for bib in new:
+        idx = bm_titles.get(bib.title)
+        if idx is None:
+            kept.append(bib)
             continue
-        idx = bm_titles.index(bib.title)
         display_bibs(["DATABASE:\n", "NEW:\n"], [bibs[idx], bib])
         s = u.req_input(
             "Possible duplicate, same title but keys differ, "
@@ -1035,8 +1087,8 @@ def merge(bibfile=None, new=None, take="old", base=None):
         if s == "r":
             bibs[idx].update_content(bib)
         elif s == "a":
-            keep[i] = True
-    new = [bib for bib,keeper in zip(new,keep) if keeper]
+            kept.append(bib)
+    new = kept
 
     # Add all new entries and sort:
     bibs = sorted(bibs + new)
@@ -1089,7 +1141,8 @@ def init(bibfile=None, reset_db=True, reset_config=False):
 
     if reset_db:
         if bibfile is None:
-            for bm_file in [u.BM_DATABASE(), u.BM_BIBFILE()]:
+            bm_files = [u.BM_DATABASE(), u.BM_BIBFILE(), u.BM_VERSION_CACHE()]
+            for bm_file in bm_files:
                 with u.ignored(OSError):
                     os.remove(bm_file)
         else:
@@ -1160,7 +1213,7 @@ def edit():
 
 
 def search(authors=None, year=None, title=None, key=None, bibcode=None,
-        tags=None):
+        tags=None, bibs=None):
     """
     Search in bibmanager database by different fields/properties.
 
@@ -1181,6 +1234,8 @@ def search(authors=None, year=None, title=None, key=None, bibcode=None,
         Match any entry whose bibcode is in the input bibcode.
     tags: String or list of strings
         Match entries containing all specified tags.
+    bibs: List of Bib() instances
+        Database where to search.  If None, load the Bibmanager database.
 
     Returns
     -------
@@ -1210,50 +1265,27 @@ def search(authors=None, year=None, title=None, key=None, bibcode=None,
     >>>                              "1957RvMP...29..547B",
     >>>                              "2017AJ....153....3C"])
     """
-    matches = load()
-
-    if year is not None:
-        if isinstance(year, int):
-            matches = [bib for bib in matches if bib.year == year]
-        else: # Assume year = [from_year, to_year]
-            matches = [
-                bib for bib in matches
-                if bib.year is not None
-                if year[0] <= bib.year <= year[1]
-            ]
-
-    if tags is not None:
-        if isinstance(tags, str):
-            tags = [tags]
-        for tag in tags:
-            matches = [bib for bib in matches if tag in bib.tags]
+    # Parse inputs:
+    if tags is not None and isinstance(tags, str):
+        tags = [tags]
 
     if authors is not None:
         if isinstance(authors, str):
             authors = [authors]
         elif not isinstance(authors, (list, tuple, np.ndarray)):
             raise ValueError("Invalid input format for 'authors'.")
-        for author in authors:
-            matches = [bib for bib in matches if author in bib]
 
     if title is not None:
         if isinstance(title, str):
             title = [title]
         elif not isinstance(title, (list, tuple, np.ndarray)):
             raise ValueError("Invalid input format for 'title'.")
-        for word in title:
-            matches = [
-                bib for bib in matches
-                if bib.title is not None
-                if word.lower() in bib.title.lower()
-            ]
 
     if key is not None:
         if isinstance(key, str):
             key = [key]
         elif not isinstance(key, (list, tuple, np.ndarray)):
             raise ValueError("Invalid input format for 'key'.")
-        matches = [bib for bib in matches if bib.key in key]
 
     if bibcode is not None:
         if isinstance(bibcode, str):
@@ -1262,9 +1294,38 @@ def search(authors=None, year=None, title=None, key=None, bibcode=None,
             raise ValueError("Invalid input format for 'bibcode'.")
         # Take care of encoding:
         bibcode = [urllib.parse.unquote(b) for b in bibcode]
-        matches = [bib for bib in matches if bib.bibcode in bibcode]
 
-    return matches
+    # Criteria to match, cheapest first:
+    checks = []
+    if key is not None:
+        checks.append(lambda bib: bib.key in key)
+    if bibcode is not None:
+        checks.append(lambda bib: bib.bibcode in bibcode)
+    if year is not None:
+        if isinstance(year, int):
+            checks.append(lambda bib: bib.year == year)
+        else: # Assume year = [from_year, to_year]
+            checks.append(
+                lambda bib: bib.year is not None
+                and year[0] <= bib.year <= year[1])
+    if tags is not None:
+        checks.append(lambda bib: all(tag in bib.tags for tag in tags))
+    if title is not None and len(title) > 0:
+        # Lower-case each word (and each title) only once:
+        words = [word.lower() for word in title]
+        def match_title(bib):
+            if bib.title is None:
+                return False
+            lower_title = bib.title.lower()
+            return all(word in lower_title for word in words)
+        checks.append(match_title)
+    if authors is not None:
+        checks.append(lambda bib: all(author in bib for author in authors))
+
+    # Single pass over the database, stop at first unmatched criterion:
+    if bibs is None:
+        bibs = load()
+    return [bib for bib in bibs if all(check(bib) for check in checks)]
 
 
 def prompt_search(keywords, field, prompt_text):
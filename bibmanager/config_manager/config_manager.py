@@ -248,6 +248,7 @@ def set(key, value):
             u.BM_DATABASE(),
             u.BM_BIBFILE(),
             u.BM_CACHE(),
+            u.BM_VERSION_CACHE(),
             u.BM_HISTORY_SEARCH(),
             u.BM_HISTORY_ADS(),
             u.BM_HISTORY_PDF(),
@@ -14,6 +14,7 @@ __all__ = [
     'BM_BIBFILE',
     'BM_TMP_BIB',
     'BM_CACHE',
+    'BM_VERSION_CACHE',
     'BM_HISTORY_SEARCH',
     'BM_HISTORY_ADS',
     'BM_HISTORY_PDF',
@@ -56,8 +57,10 @@ __all__ = [
     'AlwaysPassValidator',
 ]
 
+import functools
 import os
 import re
+import sys
 import warnings
 from collections import namedtuple
 from contextlib import contextmanager
@@ -76,13 +79,27 @@ from .. import bib_manager as bm
 HOME = os.path.expanduser('~') + '/.bibmanager/'
 ROOT = os.path.realpath(os.path.dirname(__file__) + '/..') + '/'
 
-# Unicode to start/end bold-face syntax:
-BOLD = '\033[1m'
-END  = '\033[0m'
+# Unicode to start/end bold-face syntax (only when writing to a terminal,
+# otherwise piped outputs get cluttered with escape sequences):
+if sys.stdout is not None and sys.stdout.isatty():
+    BOLD = '\033[1m'
+    END  = '\033[0m'
+else:
+    BOLD = ''
+    END  = ''
 
 # A delimiter:
 BANNER = "\n" + ":"*70 + "\n"
 
+# LaTeX accents for purify(): umlaut (group 1), special characters,
+# special + white space/brace, or special letters (group 2):
+_latex_accent = re.compile(
+    r'\\(?:"([aou])|["^`.\'~]|[cuHvdbt](?: |(?={))'
+    r'|(aa|AA|AE|oe|OE|ss|[oOlLij]))')
+_no_braces = str.maketrans('', '', '{}')
+# Any brace, for find_closing_bracket():
+_brace = re.compile('[{}]')
+
 
 # Pseudo-constants:
 def BM_DATABASE():
@@ -101,6 +118,10 @@ def BM_CACHE():
     """ADS queries cache"""
     return cm.get('home') + 'cached_ads_query.pickle'
 
+def BM_VERSION_CACHE():
+    """Version of the database (keyed by its timestamp and size)"""
+    return cm.get('home') + 'version_cache'
+
 def BM_HISTORY_SEARCH():
     """Search history"""
     return cm.get('home') + 'history_search'
@@ -318,13 +339,15 @@ def nest(text):
     0122222222111111111122222222111111110
     """
     counts = np.zeros(len(text), int)
-    for i,s in enumerate(text[:-1]):
-        if s == "{":
-            counts[i+1] = counts[i] + 1
-        elif s == "}":
-            counts[i+1] = counts[i] - 1
-        else:
-            counts[i+1] = counts[i]
+    if len(text) < 2:
+        return counts
+    # One code point per character (keeps indices aligned with text),
+    # lone surrogates included:
+    chars = np.frombuffer(
+        text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    delta = (chars == ord('{')).astype(int) - (chars == ord('}'))
+    # Nesting level changes after each brace:
+    np.cumsum(delta[:-1], out=counts[1:])
     return counts
 
 
@@ -477,27 +500,25 @@ def find_closing_bracket(text, start_pos=0, get_open=False):
     >>> print(text[start_pos:end_pos+1])
     author={last_name}
     """
-    left_bracket = text[start_pos:].find('{')
+    left_bracket = text.find('{', start_pos)
     if left_bracket < 0:
         return None
-    start_pos += left_bracket + 1
-    end_pos = len(text)
 
+    # Step from brace to brace rather than through every character:
     stack = 1
-    for index,char in enumerate(text[start_pos:end_pos]):
-        if char == '{':
+    for match in _brace.finditer(text, left_bracket+1):
+        if match.group() == '{':
             stack += 1
-        elif char == '}':
+        else:
             stack -= 1
 
         if stack == 0:
             if get_open:
-                return left_bracket, start_pos + index
-            return start_pos + index
+                return left_bracket - start_pos, match.start()
+            return match.start()
     return None
 
 
-#@functools.lru_cache(maxsize=1024, typed=False)
 def parse_name(name, nested=None, key=None):
     r"""
     Parse first, last, von, and jr parts from a name, following these rules:
@@ -540,6 +561,9 @@ def parse_name(name, nested=None, key=None):
     "St{\\'{e}}fan van der Walt":
     Author(last='Walt', first="St{\\'{e}}fan", von='van der', jr='')
     """
+    # Names without context are parsed once (see _parse_name):
+    if nested is None and key is None:
+        return _parse_name(name)
     if nested is None:
         nested = nest(name)
     name = " ".join(cond_split(name, "~", nested=nested))
@@ -562,9 +586,9 @@ def parse_name(name, nested=None, key=None):
             for word in cond_split(fields[0], " ", nested=nests[0])
             if word != ""]
         lowers = [s[0].islower() for s in words[:-1]]
-        if np.any(lowers):
-            ifirst = np.min(np.where(lowers))
-            ilast  = np.max(np.where(lowers)) + 1
+        if any(lowers):
+            ifirst = lowers.index(True)
+            ilast  = len(lowers) - lowers[::-1].index(True)
         else:
             ifirst = ilast = len(words) - 1
         # Join words, then collapse blanks:
@@ -598,8 +622,8 @@ def parse_name(name, nested=None, key=None):
             if word != ""]
         lowers = [s[0].islower() for s in words[:-1]]
 
-        if np.any(lowers):
-            ilast = np.max(np.where(lowers)) + 1
+        if any(lowers):
+            ilast = len(lowers) - lowers[::-1].index(True)
             von = " ".join(words[:ilast])
         else:
             von = ""
@@ -609,6 +633,16 @@ def parse_name(name, nested=None, key=None):
     return Author(last=last, first=first, von=von, jr=jr)
 
 
+@functools.lru_cache(maxsize=8192)
+def _parse_name(name):
+    """
+    Memoized parse_name() for names given without nesting or key context
+    (e.g., author lists of ADS queries, re-parsed on every display).
+    Author namedtuples are immutable, so the outputs can be shared.
+    """
+    return parse_name(name, nest(name))
+
+
 def repr_author(Author):
     """
     Get string representation of an Author namedtuple in the format:
@@ -642,7 +676,7 @@ def repr_author(Author):
     return name
 
 
-#@functools.lru_cache(maxsize=1024, typed=False)
+@functools.lru_cache(maxsize=8192)
 def purify(name, german=False):
     r"""
     Replace accented characters closely following these rules:
@@ -686,24 +720,21 @@ def purify(name, german=False):
     'Knausg{\\aa}rd Sm{\\o}rrebr{\\o}d' : knausgaard smorrebrod
     'Schr{\\"o}dinger Be{\\ss}er'       : schrodinger besser
     """
-    # German umlaut replace:
-    if german:
-        for pattern in ["a", "o", "u"]:
-            name = re.sub(fr'\\"{pattern}', pattern+"e", name)
-    # Remove special:
-    name = re.sub(r"\\(\"|\^|`|\.|'|~)", "", name)
-    # Remove special + white space:
-    name = re.sub(r"\\(c |u |H |v |d |b |t )", "",  name)
-    # Remove special + braces:
-    name = re.sub(r"\\(c{|u{|H{|v{|d{|b{|t{)", "{", name)
-    # Replace pattern:
-    for pattern in [
-        "o", "O", "l", "L", "i", "j", "aa", "AA", "AE", "oe", "OE", "ss"]:
-        name = re.sub(fr"\\{pattern}", pattern, name)
-    # Remove braces, clean up, and return:
-    return re.sub("({|})", "", name).strip().lower()
+    def replace(match):
+        umlaut, letter = match.groups()
+        # German umlaut replace:
+        if umlaut is not None:
+            return umlaut + 'e' if german else umlaut
+        # Replace special letters, remove everything else:
+        return '' if letter is None else letter
+
+    name = _latex_accent.sub(replace, name)
+    # Remove braces, clean up, and return (interned, since the same
+    # names repeat across the database and are compared when sorting):
+    return sys.intern(name.translate(_no_braces).strip().lower())
 
 
+@functools.lru_cache(maxsize=8192)
 def initials(name):
     r"""
     Get initials from a name.
@@ -738,7 +769,7 @@ def initials(name):
     name = purify(name)
     split_names = name.replace("-", " ").split()
     # Somehow string[0:1] does not break when string = "", unlike string[0].
-    return "".join([name[0:1] for name in split_names])
+    return sys.intern("".join([name[0:1] for name in split_names]))
 
 
 def get_authors(authors, format='long'):
@@ -811,15 +842,20 @@ def get_authors(authors, format='long'):
         return repr_author(authors[0]) + "; et al."
 
 
-def next_char(text):
+def next_char(text, start=0, end=None):
     r"""
     Get index of next non-blank character in string text.
-    Return zero if all characters are blanks.
+    Return start if all characters are blanks.
 
     Parameters
     ----------
     text: String
         A string, duh!.
+    start: Integer
+        Index where to start the search.
+    end: Integer
+        Index where to end the search (default: end of text).
+        Searching within [start:end] avoids slicing text at call sites.
 
     Examples
     --------
@@ -833,21 +869,22 @@ def next_char(text):
     ''         : 0
     '\n Hello' : 2
     '  '       : 0
+    >>> # Search from an index:
+    >>> next_char("key =  Hello", start=5)
+    7
     """
-    nchars = len(text)
-    # Empty string:
-    if nchars == 0:
-        return 0
-    i = 0
-    while text[i].isspace():
+    if end is None:
+        end = len(text)
+    i = start
+    while i < end and text[i].isspace():
         i += 1
-        # Reach end of string, all characters blanks:
-        if i == nchars:
-            return 0
+    # Reach end of string, all characters blanks:
+    if i == end:
+        return start
     return i
 
 
-def last_char(text):
+def last_char(text, start=0, end=None):
     r"""
     Get index of last non-blank character in string text.
 
@@ -855,6 +892,10 @@ def last_char(text):
     ----------
     text: String
         Any string.
+    start: Integer
+        Index where to start the search.
+    end: Integer
+        Index where to end the search (default: end of text).
 
     Returns
     -------
@@ -873,11 +914,14 @@ def last_char(text):
     ''          : 0
     '\n Hello'  : 7
     '  '        : 0
+    >>> # Search up to an index:
+    >>> last_char("Hello  , world", end=7)
+    5
     """
-    index = len(text)
-    if index == 0:
-        return 0
-    while text[index-1].isspace() and index > 0:
+    if end is None:
+        end = len(text)
+    index = end
+    while index > start and text[index-1].isspace():
         index -= 1
     return index
 
@@ -950,12 +994,14 @@ def get_fields(entry):
     yield entry[start:loc]
     loc += 1
 
-    # Next equal sign delimits key:
-    while entry[loc:].find("=") >= 0:
-        eq = entry[loc:].find("=")
-        key = entry[loc:loc+eq].strip().lower()
+    # Next equal sign delimits key (search in place, no slicing):
+    while True:
+        eq = entry.find("=", loc)
+        if eq < 0:
+            break
+        key = entry[loc:eq].strip().lower()
         # next non-blank character:
-        start = loc + eq + 1 + next_char(entry[loc+eq+1:])
+        start = next_char(entry, eq+1)
 
         if entry[start] == "{":
             end = start + nested[start+1:].index(1)
@@ -965,9 +1011,9 @@ def get_fields(entry):
             end = start + cond_next(entry[start:], '"', nested[start:], nlev=1)
         else:
             end = start + cond_next(entry[start:], ",", nested[start:], nlev=1)
-        start += next_char(entry[start:end])
-        end = start + last_char(entry[start:end])
-        loc = end + np.clip(entry[end:].find(","), 0, len(entry)) + 1
+        start = next_char(entry, start, end)
+        end = last_char(entry, start, end)
+        loc = max(entry.find(",", end), end) + 1
         yield key, entry[start:end], nested[start:end]
 
 
@@ -1069,7 +1115,7 @@ def tokenizer(attribute, value, value_token=Token.Literal.String):
     return tokens
 
 
-def parse_search(input_text):
+def parse_search(input_text, bibs=None):
     """
     Parse field-value sets from an input string which is then passed
     to bm.search().  The format is the same as in ADS and it should
@@ -1080,6 +1126,8 @@ def parse_search(input_text):
     ----------
     input_text: String
         A user-input search string.
+    bibs: List of Bib() instances
+        Database where to search.  If None, load the Bibmanager database.
 
     Returns
     -------
@@ -1147,7 +1195,7 @@ def parse_search(input_text):
     if empty_search:
         return []
 
-    matches = bm.search(authors, years, title_kw, key, bibcode, tags)
+    matches = bm.search(authors, years, title_kw, key, bibcode, tags, bibs)
     return matches
 
 
@@ -586,6 +586,13 @@ def reqs(requests_mock):
           f'&sort={sort}&fl=title,author,year,bibcode,pub')
     requests_mock.get(URL, json=mayor)
 
+    # Query as requested by manager() (default ads_display):
+    start, cache_rows = 0, 20
+    URL = ('https://api.adsabs.harvard.edu/v1/search/query?'
+          f'q={quote_query}&start={start}&rows={cache_rows}'
+          f'&sort={sort}&fl=title,author,year,bibcode,pub')
+    requests_mock.get(URL, json=mayor)
+
     start, cache_rows = 0, 2
     query = 'author:"^fortney, j" year:2000-2018 property:refereed'
     quote_query = urllib.parse.quote(query)
@@ -617,6 +624,19 @@ def reqs(requests_mock):
           f'&sort={sort}&fl=title,author,year,bibcode,pub')
     requests_mock.get(URL, json=fortney44)
 
+    start, cache_rows = 4, 2
+    fortney42 = {
+        'response': {
+            'numFound': 26,
+            'start': 4,
+            'docs': fortney44['response']['docs'][0:2],
+        }
+    }
+    URL = ('https://api.adsabs.harvard.edu/v1/search/query?'
+          f'q={quote_query}&start={start}&rows={cache_rows}'
+          f'&sort={sort}&fl=title,author,year,bibcode,pub')
+    requests_mock.get(URL, json=fortney42)
+
     start, cache_rows, sort = 0, 200, 'pubdate+desc'
     query = 'author:"^fortney, j" year:2000-2018 property:refereed'
     quote_query = urllib.parse.quote(query)
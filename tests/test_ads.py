@@ -2,10 +2,16 @@
 # bibmanager is open-source software under the MIT license (see LICENSE).
 
 import os
+import pickle
+import socket
+import threading
+import time
 import pytest
+import requests
 
 import bibmanager.bib_manager as bm
 import bibmanager.ads_manager as am
+import bibmanager.ads_manager.ads_manager as ads
 import bibmanager.config_manager as cm
 import bibmanager.utils as u
 
@@ -218,6 +224,76 @@ def test_add_bibtex_with_tags(capsys, reqs, mock_init):
 }"""
 
 
+def ads_entry(bibcode):
+    return (
+        f'@ARTICLE{{{bibcode},\n'
+        '       author = {{Doe}, John},\n'
+        '        title = "{A title}",\n'
+        '         year = 2000,\n'
+        f'       adsurl = {{https://ui.adsabs.harvard.edu/abs/{bibcode}}},\n'
+        '}\n\n')
+
+
+def test_add_bibtex_chunks(capsys, monkeypatch, mock_init):
+    # Chunks are requested concurrently, merged in the input order:
+    monkeypatch.setattr(ads, '_export_size', 1)
+    bibcodes = ['2000A&A.....1....1D', '2000A&A.....2....1D',
+        '2000A&A.....3....1D']
+    keys = ['Doe2000aa1', 'Doe2000aa2', 'Doe2000aa3']
+    exports = {
+        bibcodes[0]: ads_entry('2000Other...1....1D'),
+        bibcodes[1]: ads_entry('2000Other...2....1D'),
+        bibcodes[2]: ads_entry(bibcodes[2]),
+    }
+    requested = []
+    def export_bibtex(chunk, headers):
+        # (requests_mock serializes requests, so mock the export instead)
+        requested.extend(chunk)
+        # The first chunk answers last:
+        if chunk[0] == bibcodes[0]:
+            time.sleep(0.2)
+        return {
+            'msg': 'Retrieved 1 abstracts, starting with number 1.',
+            'export': exports[chunk[0]]}
+    monkeypatch.setattr(ads, '_export_bibtex', export_bibtex)
+    captured = capsys.readouterr()
+    am.add_bibtex(bibcodes, keys)
+    captured = capsys.readouterr()
+    assert sorted(requested) == bibcodes
+    # nfound adds up all chunks (no bibcodes reported as not found),
+    # unmatched results keep the ADS order:
+    assert captured.out == (
+        u.BANNER + "Warning:\n"
+        "\nThese ADS results did not match input bibcodes:\n\n"
+        + exports[bibcodes[0]].strip() + "\n\n"
+        + exports[bibcodes[1]].strip() + "\n"
+        + u.BANNER + "\n"
+        "\nMerged 1 new entries.\n")
+    loaded_bibs = bm.load()
+    assert [bib.key for bib in loaded_bibs] == ['Doe2000aa3']
+
+
+def test_add_bibtex_chunks_error(monkeypatch, requests_mock, mock_init):
+    # A failing later chunk raises, nothing is merged:
+    monkeypatch.setattr(ads, '_export_size', 1)
+    bibcodes = ['2000A&A.....1....1D', '2000A&A.....2....1D']
+    keys = ['Doe2000aa1', 'Doe2000aa2']
+    def export(request, context):
+        if request.json()['bibcode'] == [bibcodes[1]]:
+            context.status_code = 401
+            return {'error': 'Unauthorized'}
+        return {
+            'msg': 'Retrieved 1 abstracts, starting with number 1.',
+            'export': ads_entry(bibcodes[0])}
+    requests_mock.post(
+        "https://api.adsabs.harvard.edu/v1/export/bibtex", json=export)
+    with pytest.raises(ValueError,
+            match='Unauthorized access to ADS.  '
+                  'Check that the ADS token is valid.'):
+        am.add_bibtex(bibcodes, keys)
+    assert bm.load() == []
+
+
 @pytest.mark.skip(reason="Can I test this without monkeypatching the request?")
 def test_update(capsys, mock_init_sample):
     captured = capsys.readouterr()
@@ -259,7 +335,6 @@ def test_manager_query_no_caching(capsys, reqs, ads_entries, mock_init):
 def test_manager_query_caching(capsys, reqs, ads_entries, mock_init):
     cm.set('ads_display', '2')
     captured = capsys.readouterr()
-    am.search.__defaults__ = 0, 4, 'pubdate+desc'
     query = 'author:"^fortney, j" year:2000-2018 property:refereed'
     am.manager(query)
     captured = capsys.readouterr()
@@ -273,7 +348,6 @@ def test_manager_query_caching(capsys, reqs, ads_entries, mock_init):
 def test_manager_from_cache(capsys, reqs, ads_entries, mock_init):
     cm.set('ads_display', '2')
     captured = capsys.readouterr()
-    am.search.__defaults__ = 0, 4, 'pubdate+desc'
     query = 'author:"^fortney, j" year:2000-2018 property:refereed'
     am.manager(query)
     captured = capsys.readouterr()
@@ -284,7 +358,6 @@ def test_manager_from_cache(capsys, reqs, ads_entries, mock_init):
 
 def test_manager_cache_trigger_search(capsys, reqs, ads_entries, mock_init):
     cm.set('ads_display', '2')
-    am.search.__defaults__ = 0, 4, 'pubdate+desc'
     query = 'author:"^fortney, j" year:2000-2018 property:refereed'
     am.manager(query)
     am.manager(None)
@@ -293,3 +366,137 @@ def test_manager_cache_trigger_search(capsys, reqs, ads_entries, mock_init):
     captured = capsys.readouterr()
     expected_output = "\r\nTitle: Discovery and Atmospheric Characterization of Giant Planet Kepler-12b:\r\n    An Inflated Radius Outlier\r\nAuthors: Fortney, Jonathan J.; et al.\r\nADS URL: https://ui.adsabs.harvard.edu/abs/2011ApJS..197....9F\r\nbibcode: 2011ApJS..197....9F\r\n\r\nTitle: Self-consistent Model Atmospheres and the Cooling of the Solar System's\r\n    Giant Planets\r\nAuthors: Fortney, J. J.; et al.\r\nADS URL: https://ui.adsabs.harvard.edu/abs/2011ApJ...729...32F\r\nbibcode: 2011ApJ...729...32F\r\n\nShowing entries 5--6 out of 26 matches.  To show the next set, execute:\nbibm ads-search -n\n"
     assert captured.out == expected_output
+
+
+def test_manager_cache_content(reqs, ads_entries, mock_init):
+    cm.set('ads_display', '2')
+    query = 'author:"^fortney, j" year:2000-2018 property:refereed'
+    am.manager(query)
+    with open(u.BM_CACHE(), 'rb') as handle:
+        results, cached_query, start, index, nmatch = pickle.load(handle)
+    # Only the displayed entries were requested, nothing left cached:
+    assert results == []
+    assert cached_query == query
+    assert start == index == 2
+    assert nmatch == 26
+
+
+def test_manager_prefetch(capsys, requests_mock, reqs, ads_entries, mock_init):
+    cm.set('ads_display', '2')
+    query = 'author:"^fortney, j" year:2000-2018 property:refereed'
+    thread = am.manager(query, prefetch=True)
+    thread.join()
+    with open(u.BM_CACHE(), 'rb') as handle:
+        results, cached_query, start, index, nmatch = pickle.load(handle)
+    assert [result['bibcode'] for result in results] == [
+        '2013ApJ...775...80F', '2012ApJ...747L..27F']
+    assert start == index == 2
+    assert nmatch == 26
+    # The next set is displayed straight from the cache:
+    captured = capsys.readouterr()
+    ncalls = requests_mock.call_count
+    am.manager(None)
+    captured = capsys.readouterr()
+    assert requests_mock.call_count == ncalls
+    assert captured.out == expected_output2 + 'Showing entries 3--4 out of 26 matches.  To show the next set, execute:\nbibm ads-search -n\n'
+
+
+def test_manager_prefetch_nothing_left(reqs, ads_entries, mock_init):
+    query = 'author:"^mayor" year:1995 property:refereed'
+    assert am.manager(query, prefetch=True) is None
+
+
+def test_write_cache_failure(monkeypatch, mock_init):
+    # A failed write leaves neither a temporary file nor a broken cache:
+    cache = u.BM_CACHE()
+    ads._write_cache(cache, ['old'])
+    def dump(*args, **kwargs):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(ads.pickle, 'dump', dump)
+    with pytest.raises(KeyboardInterrupt):
+        ads._write_cache(cache, ['new'])
+    assert not os.path.exists(f'{cache}.tmp')
+    with open(cache, 'rb') as handle:
+        assert pickle.load(handle) == ['old']
+
+
+def test_search_timeout(requests_mock, mock_init):
+    requests_mock.get(
+        'https://api.adsabs.harvard.edu/v1/search/query',
+        exc=requests.exceptions.ConnectTimeout)
+    with pytest.raises(ValueError,
+            match='ADS request timed out, try again later.'):
+        am.search('author:"^fortney, j"')
+
+
+def test_request_timeouts(reqs, requests_mock, mock_init):
+    # Searches fail fast, large exports get a longer read timeout:
+    am.search('author:"^fortney, j" year:2000-2018 property:refereed',
+        start=0, cache_rows=2)
+    assert requests_mock.last_request.timeout == (3.05, 20)
+    am.add_bibtex(['1925PhDT.........1P'], ['Payne1925phdStellarAtmospheres'])
+    assert requests_mock.last_request.timeout == (3.05, 120)
+
+
+@pytest.fixture
+def silent_server():
+    """A local HTTP server that accepts connections but never replies."""
+    server = socket.socket()
+    server.bind(('127.0.0.1', 0))
+    server.listen()
+    connections = []
+    def accept():
+        while True:
+            try:
+                connections.append(server.accept()[0])
+            except OSError:
+                return
+    threading.Thread(target=accept, daemon=True).start()
+    yield f'http://127.0.0.1:{server.getsockname()[1]}/', connections
+    server.close()
+    for connection in connections:
+        connection.close()
+
+
+def test_search_read_timeout(monkeypatch, mock_init, silent_server):
+    # Go through the ADS session adapter (and its retry policy):
+    url, connections = silent_server
+    session = ads._session
+    monkeypatch.setitem(session.adapters, 'http://', session.adapters['https://'])
+    session_get = session.get
+    monkeypatch.setattr(
+        session, 'get', lambda _, **kwargs: session_get(url, **kwargs))
+    monkeypatch.setattr(ads, '_timeout', (1.0, 0.5))
+
+    t0 = time.time()
+    with pytest.raises(ValueError,
+            match='ADS request timed out, try again later.'):
+        am.search('author:"^fortney, j"')
+    # Read timeouts are not retried:
+    assert time.time() - t0 < 2.0
+    assert len(connections) == 1
+
+
+def test_search_connection_error(requests_mock, mock_init):
+    requests_mock.get(
+        'https://api.adsabs.harvard.edu/v1/search/query',
+        exc=requests.exceptions.ConnectionError)
+    with pytest.raises(ValueError,
+            match='Could not connect to ADS, try again later.'):
+        am.search('author:"^fortney, j"')
+
+
+def test_manager_no_matches(capsys, requests_mock, mock_init):
+    requests_mock.get(
+        'https://api.adsabs.harvard.edu/v1/search/query',
+        json={'response': {'numFound': 0, 'start': 0, 'docs': []}})
+    am.manager('author:"^nobody, n"')
+    captured = capsys.readouterr()
+    assert captured.out == "There are no entries matching this query.\n"
+    assert not os.path.exists(u.BM_CACHE())
+
+
+def test_display_nothing_to_show(capsys):
+    am.display([], 0, 0, 2, 26)
+    captured = capsys.readouterr()
+    assert captured.out == ''
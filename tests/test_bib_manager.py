@@ -76,6 +76,17 @@ def test_Bib_ads_entry(entries):
     assert bib.month == 1
 
 
+def test_Bib_encoded_adsurl():
+    bib = bm.Bib("""@ARTICLE{AstropyCollab2013aaAstropy,
+   author = {{Astropy Collaboration}},
+    title = "{Astropy: A community Python package for astronomy}",
+  journal = {\\aap},
+     year = 2013,
+   adsurl = {https://ui.adsabs.harvard.edu/abs/2013A\\%26A...558A..33A},
+}""")
+    assert bib.bibcode == "2013A&A...558A..33A"
+
+
 def test_Bib_update_content_bib_info(entries):
     bib1 = bm.Bib(entries['jones_minimal'])
     bib1.bibcode = 'bibcode1'
@@ -850,6 +861,36 @@ def test_get_version_filed(tmp_path, mock_init):
     assert bm.get_version(db) == expected_version
 
 
+def test_get_version_cached(mock_init):
+    expected_version = '1.0.0'
+    with open(u.BM_DATABASE(), 'wb') as handle:
+        pickle.dump([], handle, protocol=4)
+        pickle.dump(expected_version, handle, protocol=4)
+    assert bm.get_version() == expected_version
+    stat = os.stat(u.BM_DATABASE())
+    with open(u.BM_VERSION_CACHE(), 'r') as handle:
+        cache = handle.read()
+    assert cache == f'{stat.st_mtime_ns}:{stat.st_size}|{expected_version}'
+    # An up-to-date cache is used without unpickling the database:
+    with open(u.BM_VERSION_CACHE(), 'w') as handle:
+        handle.write(f'{stat.st_mtime_ns}:{stat.st_size}|9.9.9')
+    assert bm.get_version() == '9.9.9'
+
+
+def test_get_version_stale_cache(mock_init):
+    with open(u.BM_VERSION_CACHE(), 'w') as handle:
+        handle.write('0:0|9.9.9')
+    assert bm.get_version() == bibm.__version__
+
+
+def test_get_version_unwritable_cache(tmp_path, monkeypatch, mock_init):
+    # Failing to write the version cache does not break the version check:
+    monkeypatch.setattr(
+        u, 'BM_VERSION_CACHE', lambda: f'{tmp_path}/missing/version_cache')
+    bm.save([])
+    assert bm.get_version() == bibm.__version__
+
+
 def test_export_home(bibs, mock_init):
     my_bibs = [bibs["stodden"], bibs["beaulieu_apj"]]
     bm.export(my_bibs, u.BM_BIBFILE())
@@ -1209,6 +1250,15 @@ def test_search_key_multiple(mock_init_sample):
     assert 'BurbidgeEtal1957rvmpStellarElementSynthesis' in keys
 
 
+def test_search_given_bibs(mock_init_sample):
+    bibs = bm.load()[0:2]
+    matches = bm.search(year=[1900,2030], bibs=bibs)
+    assert [m.key for m in matches] == [bib.key for bib in bibs]
+    matches = bm.search(key="BurbidgeEtal1957rvmpStellarElementSynthesis",
+        bibs=bibs)
+    assert matches == []
+
+
 @pytest.mark.skip(reason='TBD')
 def test_search_single_tag():
     pass
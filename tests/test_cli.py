@@ -9,7 +9,6 @@ import pytest
 
 import bibmanager
 import bibmanager.utils as u
-import bibmanager.ads_manager as am
 import bibmanager.bib_manager as bm
 import bibmanager.config_manager as cm
 import bibmanager.__main__ as cli
@@ -68,6 +67,17 @@ def test_cli_help(capsys):
     assert captured.out == main_description
 
 
+def test_cli_no_command_skips_version_check(capsys, mock_init):
+    with open(u.BM_DATABASE(), 'wb') as handle:
+        pickle.dump([], handle, protocol=4)
+        pickle.dump('999.0.0', handle, protocol=4)
+    sys.argv = ["bibm"]
+    cli.main()
+    captured = capsys.readouterr()
+    assert "older than saved database" not in captured.out
+    assert "These are the bibmanager commands" in captured.out
+
+
 def test_cli_reset_all(capsys, mock_init_sample):
     pathlib.Path(u.BM_BIBFILE()).touch()
     cm.set("ads_display", "10")
@@ -111,6 +121,7 @@ def test_cli_reset_config(capsys, mock_init_sample):
     assert set(os.listdir(u.HOME)) == set([
         "bm_database.pickle",
         "bm_bibliography.bib",
+        "version_cache",
         "config",
         "examples",
         "pdf",
@@ -129,6 +140,7 @@ def test_cli_reset_keep_database(capsys, mock_init_sample):
     assert set(os.listdir(u.HOME)) == set([
         "bm_database.pickle",
         "bm_bibliography.bib",
+        "version_cache",
         "config",
         "examples",
         "pdf",
@@ -520,7 +532,6 @@ def test_cli_latex_invalid_extension(capsys, mock_init_sample, directive):
     indirect=True)
 def test_cli_ads_search(capsys, reqs, mock_prompt_session, mock_init):
     cm.set('ads_display', '2')
-    am.search.__defaults__ = 0, 2, 'pubdate+desc'
     sys.argv = "bibm ads-search".split()
     captured = capsys.readouterr()
     cli.main()
@@ -529,13 +540,25 @@ def test_cli_ads_search(capsys, reqs, mock_prompt_session, mock_init):
     assert captured.out == expected_output
 
 
+@pytest.mark.parametrize(
+    'mock_prompt_session',
+    [['author:"^fortney, j" year:2000-2018 property:refereed']],
+    indirect=True)
+def test_cli_ads_search_no_prefetch(
+        reqs, requests_mock, mock_prompt_session, mock_init):
+    # Without an add/fetch prompt, there is nothing to prefetch for:
+    cm.set('ads_display', '2')
+    sys.argv = "bibm ads-search".split()
+    cli.main()
+    assert requests_mock.call_count == 1
+
+
 @pytest.mark.parametrize(
     'mock_prompt_session',
     [['author:"^fortney, j" year:2000-2018 property:refereed']],
     indirect=True)
 def test_cli_ads_search_next(capsys, reqs, mock_prompt_session, mock_init):
     cm.set('ads_display', '2')
-    am.search.__defaults__ = 0, 2, 'pubdate+desc'
     sys.argv = "bibm ads-search".split()
     cli.main()
     captured = capsys.readouterr()
@@ -552,7 +575,6 @@ def test_cli_ads_search_next(capsys, reqs, mock_prompt_session, mock_init):
 def test_cli_ads_search_empty_next(
         capsys, reqs, mock_prompt_session, mock_init):
     cm.set('ads_display', '2')
-    am.search.__defaults__ = 0, 2, 'pubdate+desc'
     sys.argv = "bibm ads-search".split()
     cli.main()
     captured = capsys.readouterr()
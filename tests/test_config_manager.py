@@ -226,7 +226,8 @@ def test_set_home_success(capsys, tmp_path, mock_init_sample):
     assert set(os.listdir(u.HOME)) == set(["config", "examples", "pdf"])
     # These files have been moved/created:
     assert set(os.listdir(str(new_home))) == \
-        set(['pdf', 'bm_bibliography.bib', 'bm_database.pickle'])
+        set(['pdf', 'bm_bibliography.bib', 'bm_database.pickle',
+             'version_cache'])
 
 
 def test_set_home_pdf_success(tmp_path, mock_init_sample):
@@ -304,7 +305,8 @@ def test_set_home_and_edit(tmp_path, mock_init, bibs, reqs):
     assert set(os.listdir(u.HOME)) == set(["config", "examples", "pdf"])
     # These files have been moved/created:
     assert set(os.listdir(str(new_home))) == \
-        set(['pdf', 'bm_bibliography.bib', 'bm_database.pickle'])
+        set(['pdf', 'bm_bibliography.bib', 'bm_database.pickle',
+             'version_cache'])
 
 
 def test_set_home_no_parent(mock_init_sample):
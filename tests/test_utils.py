@@ -36,6 +36,16 @@ def test_nest():
                   2,2,2,1,1,1,1,1,1,1,1,0]))
 
 
+def test_nest_non_ascii():
+    # Levels are per character, not per encoded byte:
+    np.testing.assert_array_equal(
+        u.nest("{Pérez} {Ø}"), np.array([0,1,1,1,1,1,1,0,0,1,1]))
+    # Lone surrogates (e.g., from escaped ADS JSON) do not break it:
+    np.testing.assert_array_equal(
+        u.nest("{Sm\udcc3ith}"), np.array([0,1,1,1,1,1,1,1]))
+    assert u.parse_name('{Sm\udcc3ith}, J.').last == '{Sm\udcc3ith}'
+
+
 def test_cond_split1():
     assert u.cond_split("", ",") == [""]
     assert u.cond_split("abcd",      ",") == ["abcd"]
@@ -353,6 +363,23 @@ def test_purify():
     assert u.purify('Be{\\ss}er')                   == 'besser'
 
     assert u.purify('Schr{\\"o}dinger', german=True) == 'schroedinger'
+    assert u.purify('M{\\"u}ller {\\"A}', german=True) == 'mueller a'
+    assert u.purify('{\\OE}uvre C{\\oe}ur {\\AE}sir') == 'oeuvre coeur aesir'
+    assert u.purify('Cort{\\\'\\i}s {\\H{o}}') == 'cortis o'
+
+
+def test_purify_cached():
+    u.purify.cache_clear()
+    u.purify('Schr{\\"o}dinger')
+    u.purify('Schr{\\"o}dinger')
+    assert u.purify.cache_info().hits == 1
+    # The german flag is part of the cache key:
+    assert u.purify('Schr{\\"o}dinger', german=True) == 'schroedinger'
+
+
+def test_purify_interned():
+    # Different spellings of a same name share a single string object:
+    assert u.purify("P{\\'e}rez") is u.purify('Perez')
 
 
 def test_initials():
@@ -438,6 +465,12 @@ def test_next_char():
     assert u.next_char('  ')       == 0
 
 
+def test_next_char_window():
+    assert u.next_char('key =  Hello', start=5)       == 7
+    assert u.next_char('key =  Hello', start=5, end=7) == 5
+    assert u.next_char('  Hello', start=2)            == 2
+
+
 def test_last_char():
     assert u.last_char('Hello')     == 5
     assert u.last_char('  Hello')   == 7
@@ -447,6 +480,12 @@ def test_last_char():
     assert u.last_char('  ')        == 0
 
 
+def test_last_char_window():
+    assert u.last_char('Hello  , world', end=7)          == 5
+    assert u.last_char('Hello  , world', start=5, end=7) == 5
+    assert u.last_char('a, Hello  ', start=2)            == 8
+
+
 def test_get_fields():
     entry = '''
 @Article{Hunter2007ieeeMatplotlib,
@@ -641,3 +680,10 @@ def test_parse_search_multiple_keys(mock_init_sample):
     assert matches[0].key == 'Curtis1917paspIslandUniverseTheory'
     assert matches[1].key == 'Shapley1918apjDistanceGlobularClusters'
 
+
+def test_parse_name_cached():
+    name = 'Fontaine, sr., Jean'
+    author = u.parse_name(name)
+    assert u.parse_name(name) is author
+    # Same result as when parsing with the nested levels:
+    assert u.parse_name(name, u.nest(name)) == author